@@ -16,6 +16,7 @@ class Config:
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4-turbo-preview')
+    AI_ANALYSIS_CONCURRENCY = int(os.getenv('AI_ANALYSIS_CONCURRENCY', 4))
     
     # Azure OpenAI Configuration (alternative)
     AZURE_OPENAI_API_KEY = os.getenv('AZURE_OPENAI_API_KEY', '')
@@ -28,6 +29,8 @@ class Config:
     # Apollo.io Configuration
     APOLLO_API_KEY = os.getenv('APOLLO_API_KEY', '')
     APOLLO_MAX_LEADS_PER_SEARCH = int(os.getenv('APOLLO_MAX_LEADS_PER_SEARCH', 100))
+    APOLLO_ENRICH_CONCURRENCY = int(os.getenv('APOLLO_ENRICH_CONCURRENCY', 5))
+    APOLLO_CACHE_TTL = int(os.getenv('APOLLO_CACHE_TTL', 3600))  # Seconds, 0 disables
     
     # Request timeout
     REQUEST_TIMEOUT = 30
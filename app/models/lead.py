@@ -5,6 +5,7 @@ Lead Data Model
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+import math
 from typing import Optional, Dict, List
 import uuid
 
@@ -37,6 +38,33 @@ class LeadSource(str, Enum):
     APOLLO_IO = 'apollo.io'
 
 
+# Value -> member lookups used when loading leads; plain dict probes avoid the
+# Enum metaclass call overhead for every lead read from storage
+_STATUS_BY_VALUE = {status.value: status for status in LeadStatus}
+_PRIORITY_BY_VALUE = {priority.value: priority for priority in LeadPriority}
+_SOURCE_BY_VALUE = {source.value: source for source in LeadSource}
+
+
+def _to_number(value, field_name: str):
+    """Validate a numeric lead field, parsing numeric strings"""
+    # Rejected here, before a lead is created or changed, so the lead
+    # manager's running score/value totals never see a non-numeric value
+    number = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = value
+    elif isinstance(value, str):
+        try:
+            number = int(value)
+        except ValueError:
+            try:
+                number = float(value)
+            except ValueError:
+                pass
+    if number is None or not math.isfinite(number):
+        raise ValueError(f"Invalid {field_name}: {value!r}")
+    return number
+
+
 @dataclass
 class Lead:
     """Lead data class"""
@@ -113,41 +141,45 @@ class Lead:
     @classmethod
     def from_dict(cls, data: Dict) -> 'Lead':
         """Create lead from dictionary"""
-        # Handle status conversion
+        # Handle status conversion (unknown values still raise ValueError)
         status = data.get('status', 'new')
         if isinstance(status, str):
-            status = LeadStatus(status)
+            status = _STATUS_BY_VALUE.get(status) or LeadStatus(status)
         
         # Handle priority conversion
         priority = data.get('priority', 'medium')
         if isinstance(priority, str):
-            priority = LeadPriority(priority)
+            priority = _PRIORITY_BY_VALUE.get(priority) or LeadPriority(priority)
         
         # Handle source conversion
         source = data.get('source', 'ai-generated')
         if isinstance(source, str):
-            try:
-                source = LeadSource(source)
-            except ValueError:
-                source = LeadSource.AI_GENERATED
+            source = _SOURCE_BY_VALUE.get(source, LeadSource.AI_GENERATED)
         
-        # Handle datetime conversion
+        # Handle datetime conversion (a new lead gets one shared timestamp)
+        now = None
         created_at = data.get('created_at')
         if isinstance(created_at, str):
             created_at = datetime.fromisoformat(created_at)
         elif created_at is None:
-            created_at = datetime.utcnow()
+            created_at = now = datetime.utcnow()
         
         updated_at = data.get('updated_at')
         if isinstance(updated_at, str):
             updated_at = datetime.fromisoformat(updated_at)
         elif updated_at is None:
-            updated_at = datetime.utcnow()
+            updated_at = now or datetime.utcnow()
         
         last_contacted = data.get('last_contacted')
         if isinstance(last_contacted, str):
             last_contacted = datetime.fromisoformat(last_contacted)
         
+        # A missing or null score/value falls back to the default
+        score = data.get('score')
+        score = 50 if score is None else _to_number(score, 'score')
+        estimated_value = data.get('estimated_value')
+        estimated_value = 0.0 if estimated_value is None else _to_number(estimated_value, 'estimated_value')
+        
         return cls(
             id=data.get('id', str(uuid.uuid4())),
             company_name=data.get('company_name', ''),
@@ -163,7 +195,7 @@ class Lead:
             status=status,
             priority=priority,
             source=source,
-            score=data.get('score', 50),
+            score=score,
             ai_analysis=data.get('ai_analysis'),
             ai_score_breakdown=data.get('ai_score_breakdown'),
             notes=data.get('notes'),
@@ -172,23 +204,32 @@ class Lead:
             updated_at=updated_at,
             last_contacted=last_contacted,
             source_url=data.get('source_url'),
-            estimated_value=data.get('estimated_value', 0.0)
+            estimated_value=estimated_value
         )
     
     def update(self, data: Dict) -> None:
         """Update lead with new data"""
+        # Convert every value before setting any, so an invalid value
+        # leaves the lead unchanged
+        changes = {}
         for key, value in data.items():
             if hasattr(self, key) and value is not None:
-                if key == 'status' and isinstance(value, str):
-                    value = LeadStatus(value)
-                elif key == 'priority' and isinstance(value, str):
-                    value = LeadPriority(value)
+                if key == 'status':
+                    value = _STATUS_BY_VALUE.get(value) or LeadStatus(value)
+                elif key == 'priority':
+                    value = _PRIORITY_BY_VALUE.get(value) or LeadPriority(value)
                 elif key == 'source' and isinstance(value, str):
-                    try:
-                        value = LeadSource(value)
-                    except ValueError:
+                    value = _SOURCE_BY_VALUE.get(value)
+                    if value is None:
                         continue
-                setattr(self, key, value)
+                elif key in ('score', 'estimated_value'):
+                    value = _to_number(value, key)
+                elif key in ('created_at', 'updated_at', 'last_contacted') and isinstance(value, str):
+                    value = datetime.fromisoformat(value)
+                changes[key] = value
+        
+        for key, value in changes.items():
+            setattr(self, key, value)
         
         self.updated_at = datetime.utcnow()
 
@@ -8,17 +8,33 @@ from loguru import logger
 from datetime import datetime
 import threading
 import asyncio
+from collections import deque
+from itertools import repeat
 
 from app.services.apollo_service import ApolloService
-from app.services.shared_services import lead_manager, ai_analyzer
+from app.services import shared_services
 
 apollo_bp = Blueprint('apollo', __name__)
 
 # Initialize services
 apollo_service = ApolloService()
 
-# Store for tracking search jobs
+# Store for tracking search jobs. The lock only guards adding jobs to (and
+# listing) the mapping; each job's own dict is mutated solely by its worker
+# thread, so unrelated jobs never contend with each other.
 search_jobs = {}
+search_jobs_lock = threading.Lock()
+
+# Only the most recent errors are kept per job
+MAX_JOB_ERRORS = 100
+
+# Static filter options reported by /config, built once rather than per request
+AVAILABLE_FILTERS = {
+    'person_titles': ['CEO', 'Director', 'Manager', 'Owner', 'Founder', 'VP', 'Head of'],
+    'employee_ranges': ['1,10', '11,50', '51,200', '201,500', '501,1000', '1001,5000'],
+    'seniority_levels': ['owner', 'founder', 'c_suite', 'partner', 'vp', 'head', 'director', 'manager', 'senior', 'entry']
+}
+SEARCH_TYPES = ['people', 'organizations']
 
 
 @apollo_bp.route('/search/people', methods=['POST'])
@@ -152,18 +168,19 @@ def generate_leads():
         save_leads = data.get('save_leads', True)
         
         # Generate job ID
-        job_id = f"apollo_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        now = datetime.utcnow()
+        job_id = f"apollo_{now.strftime('%Y%m%d_%H%M%S')}"
         
         # Initialize job status
-        search_jobs[job_id] = {
+        job = {
             'id': job_id,
             'status': 'running',
-            'started_at': datetime.utcnow().isoformat(),
+            'started_at': now.isoformat(),
             'completed_at': None,
             'total_leads': 0,
             'processed_leads': 0,
             'saved_leads': 0,
-            'errors': [],
+            'errors': deque(maxlen=MAX_JOB_ERRORS),
             'parameters': {
                 'search_type': search_type,
                 'person_titles': person_titles,
@@ -176,11 +193,20 @@ def generate_leads():
                 'save_leads': save_leads
             }
         }
+        with search_jobs_lock:
+            # Jobs started within the same second would otherwise share an id
+            # and overwrite each other's entry
+            base_id, suffix = job_id, 1
+            while job_id in search_jobs:
+                suffix += 1
+                job_id = f"{base_id}_{suffix}"
+            job['id'] = job_id
+            search_jobs[job_id] = job
         
         # Start generation in background thread
         thread = threading.Thread(
             target=run_generation_job,
-            args=(job_id, search_type, person_titles, person_locations,
+            args=(job, search_type, person_titles, person_locations,
                   organization_locations, organization_industries, keywords,
                   max_leads, analyze_with_ai, save_leads)
         )
@@ -206,10 +232,11 @@ def generate_leads():
         }), 500
 
 
-def run_generation_job(job_id, search_type, person_titles, person_locations,
+def run_generation_job(job, search_type, person_titles, person_locations,
                        organization_locations, organization_industries, keywords,
                        max_leads, analyze_with_ai, save_leads):
     """Execute lead generation job in background"""
+    job_id = job['id']
     try:
         logger.info(f"Running Apollo generation job {job_id}")
         
@@ -217,68 +244,34 @@ def run_generation_job(job_id, search_type, person_titles, person_locations,
         
         # Perform search based on type
         if search_type == 'people':
-            # First, search for people matching the filters
-            result = asyncio.run(
-                apollo_service.search_people(
-                    person_titles=person_titles if person_titles else None,
-                    person_locations=person_locations if person_locations else None,
-                    organization_locations=organization_locations if organization_locations else None,
-                    organization_industries=organization_industries if organization_industries else None,
-                    q_keywords=keywords if keywords else None,
-                    per_page=min(max_leads, 100),
-                    page=1,
-                )
-            )
-
-            if result.get('success'):
-                people = result.get('people', [])[:max_leads]
-
-                # Enrich each person to reveal emails & phones (uses credits per Apollo docs).
-                enriched_people = []
-                for idx, person in enumerate(people):
-                    try:
-                        # Extract available identifiers from search result
-                        person_id = person.get("id")
-                        email = person.get("email")
-                        linkedin_url = person.get("linkedin_url")
-                        first_name = person.get("first_name")
-                        last_name = person.get("last_name")
-                        org = person.get("organization", {}) or {}
-                        organization_name = org.get("name") or person.get("organization_name")
-                        domain = org.get("primary_domain") or org.get("website_url")
-                        
-                        logger.debug(f"Enriching person {idx+1}/{len(people)}: {first_name} {last_name} at {organization_name}")
-                        
-                        enriched_result = asyncio.run(
-                            apollo_service.enrich_person(
-                                email=email,
-                                linkedin_url=linkedin_url,
-                                person_id=person_id,
-                                first_name=first_name,
-                                last_name=last_name,
-                                organization_name=organization_name,
-                                domain=domain,
-                                reveal_personal_emails=True,
-                                reveal_phone_number=False,  # Only need emails, phone requires webhook_url
-                            )
-                        )
-                        
-                        if enriched_result.get("success") and enriched_result.get("person"):
-                            enriched_person = enriched_result["person"]
-                            enriched_email = enriched_person.get("email")
-                            logger.info(f"Enrichment successful for {first_name} {last_name}: email={bool(enriched_email)}")
-                            enriched_people.append(enriched_person)
-                        else:
-                            error_msg = enriched_result.get("error", "Unknown error")
-                            logger.warning(f"Enrichment failed for {first_name} {last_name}: {error_msg}. Using original data.")
-                            # Fallback to original person data if enrichment fails
-                            enriched_people.append(person)
-                    except Exception as enrich_err:
-                        logger.error(f"Error enriching person {idx+1} from Apollo: {enrich_err}")
-                        enriched_people.append(person)
-
-                for person in enriched_people:
-                    leads_data.append(apollo_service.transform_person_to_lead(person))
+            async def search_and_enrich():
+                # The search and the enrichment calls share one pooled client,
+                # so enrichment reuses the connection the search opened
+                async with apollo_service.http_client() as client:
+                    # First, search for people matching the filters
+                    result = await apollo_service.search_people(
+                        person_titles=person_titles if person_titles else None,
+                        person_locations=person_locations if person_locations else None,
+                        organization_locations=organization_locations if organization_locations else None,
+                        organization_industries=organization_industries if organization_industries else None,
+                        q_keywords=keywords if keywords else None,
+                        per_page=min(max_leads, 100),
+                        page=1,
+                        client=client,
+                    )
+                    if not result.get('success'):
+                        return []
+                    
+                    people = result.get('people', [])[:max_leads]
+                    
+                    if save_leads:
+                        people = _skip_known_people(people)
+                    
+                    # Enrich people concurrently to reveal emails (uses credits per Apollo docs)
+                    return await apollo_service.enrich_people(people, client=client)
+            
+            for person in asyncio.run(search_and_enrich()):
+                leads_data.append(apollo_service.transform_person_to_lead(person))
         else:
             result = asyncio.run(apollo_service.search_organizations(
                 organization_locations=organization_locations if organization_locations else None,
@@ -292,18 +285,22 @@ def run_generation_job(job_id, search_type, person_titles, person_locations,
                 for org in result.get('organizations', [])[:max_leads]:
                     leads_data.append(apollo_service.transform_organization_to_lead(org))
         
-        search_jobs[job_id]['total_leads'] = len(leads_data)
+        job['total_leads'] = len(leads_data)
         logger.info(f"Found {len(leads_data)} leads from Apollo")
         
         # Process and save leads
         processed_count = 0
         saved_count = 0
         
-        for lead_data in leads_data:
+        # Analyses run in parallel; results arrive in order as the loop saves them
+        analyses = shared_services.ai_analyzer.iter_analyze_lead_data(leads_data) if analyze_with_ai else repeat(None)
+        
+        for lead_data, analysis in zip(leads_data, analyses):
             try:
                 # Analyze with AI if requested
                 if analyze_with_ai:
-                    analysis = ai_analyzer.analyze_lead_data(lead_data)
+                    if isinstance(analysis, Exception):
+                        raise analysis
                     lead_data['ai_analysis'] = analysis
                     lead_data['score'] = analysis.get('score', 50)
                     lead_data['priority'] = analysis.get('priority', 'medium')
@@ -312,29 +309,52 @@ def run_generation_job(job_id, search_type, person_titles, person_locations,
                 if save_leads:
                     # Remove raw_data before saving (too large)
                     save_data = {k: v for k, v in lead_data.items() if k != 'raw_data'}
-                    lead = lead_manager.create_lead(save_data)
+                    lead = shared_services.lead_manager.create_lead(save_data)
                     saved_count += 1
                 
                 processed_count += 1
-                search_jobs[job_id]['processed_leads'] = processed_count
-                search_jobs[job_id]['saved_leads'] = saved_count
+                job['processed_leads'] = processed_count
+                job['saved_leads'] = saved_count
                 
             except Exception as e:
-                search_jobs[job_id]['errors'].append(str(e))
+                job['errors'].append(str(e))
                 logger.error(f"Error processing lead: {str(e)}")
         
         # Mark job as completed
-        search_jobs[job_id]['status'] = 'completed'
-        search_jobs[job_id]['completed_at'] = datetime.utcnow().isoformat()
+        job['status'] = 'completed'
+        job['completed_at'] = datetime.utcnow().isoformat()
         
         logger.info(f"Apollo job {job_id} completed. Processed {processed_count}, Saved {saved_count}")
         
     except Exception as e:
-        search_jobs[job_id]['status'] = 'failed'
-        search_jobs[job_id]['errors'].append(str(e))
+        job['status'] = 'failed'
+        job['errors'].append(str(e))
         logger.error(f"Apollo job {job_id} failed: {str(e)}")
 
 
+def _job_to_dict(job):
+    """Copy a job for JSON responses (the errors deque is not serializable)"""
+    return {**job, 'errors': list(job['errors'])}
+
+
+def _skip_known_people(people):
+    """Drop duplicate people and people already saved as leads by an earlier job"""
+    known_urls = shared_services.lead_manager.get_source_urls()
+    unique_people = []
+    for person in people:
+        source_url = apollo_service.person_source_url(person)
+        if source_url:
+            if source_url in known_urls:
+                continue
+            known_urls.add(source_url)
+        unique_people.append(person)
+    
+    skipped = len(people) - len(unique_people)
+    if skipped:
+        logger.info(f"Skipping {skipped} people already saved as leads")
+    return unique_people
+
+
 @apollo_bp.route('/status/<job_id>', methods=['GET'])
 def get_job_status(job_id):
     """Get status of an Apollo lead generation job"""
@@ -347,7 +367,7 @@ def get_job_status(job_id):
         
         return jsonify({
             'success': True,
-            'data': search_jobs[job_id]
+            'data': _job_to_dict(search_jobs[job_id])
         })
         
     except Exception as e:
@@ -362,7 +382,8 @@ def get_job_status(job_id):
 def list_jobs():
     """List all Apollo lead generation jobs"""
     try:
-        jobs = list(search_jobs.values())
+        with search_jobs_lock:
+            jobs = [_job_to_dict(job) for job in search_jobs.values()]
         jobs.sort(key=lambda x: x['started_at'], reverse=True)
         
         return jsonify({
@@ -441,12 +462,8 @@ def get_apollo_config():
             'target_locations': current_app.config.get('TARGET_LOCATIONS', []),
             'target_industries': current_app.config.get('TARGET_INDUSTRIES', []),
             'max_leads_per_search': 100,
-            'available_filters': {
-                'person_titles': ['CEO', 'Director', 'Manager', 'Owner', 'Founder', 'VP', 'Head of'],
-                'employee_ranges': ['1,10', '11,50', '51,200', '201,500', '501,1000', '1001,5000'],
-                'seniority_levels': ['owner', 'founder', 'c_suite', 'partner', 'vp', 'head', 'director', 'manager', 'senior', 'entry']
-            },
-            'search_types': ['people', 'organizations']
+            'available_filters': AVAILABLE_FILTERS,
+            'search_types': SEARCH_TYPES
         }
         
         return jsonify({
@@ -8,7 +8,7 @@ from datetime import datetime
 import os
 
 from app.services.export_service import ExportService
-from app.services.shared_services import lead_manager
+from app.services import shared_services
 
 export_bp = Blueprint('export', __name__)
 
@@ -31,9 +31,9 @@ def export_to_excel():
         
         # Get leads to export
         if lead_ids:
-            leads = [lead_manager.get_lead_by_id(lid) for lid in lead_ids if lead_manager.get_lead_by_id(lid)]
+            leads = shared_services.lead_manager.get_leads_by_ids(lead_ids)
         else:
-            leads, _ = lead_manager.get_leads(
+            leads, _ = shared_services.lead_manager.get_leads(
                 status=status,
                 priority=priority,
                 page=1,
@@ -83,9 +83,9 @@ def export_to_csv():
         
         # Get leads to export
         if lead_ids:
-            leads = [lead_manager.get_lead_by_id(lid) for lid in lead_ids if lead_manager.get_lead_by_id(lid)]
+            leads = shared_services.lead_manager.get_leads_by_ids(lead_ids)
         else:
-            leads, _ = lead_manager.get_leads(
+            leads, _ = shared_services.lead_manager.get_leads(
                 status=status,
                 priority=priority,
                 page=1,
@@ -8,7 +8,7 @@ from datetime import datetime
 import uuid
 
 from app.models.lead import Lead, LeadStatus, LeadPriority
-from app.services.shared_services import lead_manager, ai_analyzer
+from app.services import shared_services
 
 leads_bp = Blueprint('leads', __name__)
 
@@ -27,7 +27,7 @@ def get_leads():
         per_page = int(request.args.get('per_page', 20))
         
         # Get leads from manager
-        leads, total = lead_manager.get_leads(
+        leads, total = shared_services.lead_manager.get_leads(
             status=status,
             priority=priority,
             industry=industry,
@@ -60,7 +60,7 @@ def get_leads():
 def get_lead(lead_id):
     """Get a single lead by ID"""
     try:
-        lead = lead_manager.get_lead_by_id(lead_id)
+        lead = shared_services.lead_manager.get_lead_by_id(lead_id)
         
         if not lead:
             return jsonify({
@@ -97,13 +97,13 @@ def create_lead():
                 }), 400
         
         # Create lead
-        lead = lead_manager.create_lead(data)
+        lead = shared_services.lead_manager.create_lead(data)
         
         # Optionally analyze with AI
         if data.get('analyze', False):
-            analysis = ai_analyzer.analyze_lead(lead)
+            analysis = shared_services.ai_analyzer.analyze_lead(lead)
             lead.ai_analysis = analysis
-            lead_manager.update_lead(lead.id, {'ai_analysis': analysis})
+            shared_services.lead_manager.update_lead(lead.id, {'ai_analysis': analysis})
         
         logger.info(f"Created new lead: {lead.company_name}")
         
@@ -126,7 +126,7 @@ def update_lead(lead_id):
     try:
         data = request.get_json()
         
-        lead = lead_manager.update_lead(lead_id, data)
+        lead = shared_services.lead_manager.update_lead(lead_id, data)
         
         if not lead:
             return jsonify({
@@ -153,7 +153,7 @@ def update_lead(lead_id):
 def delete_lead(lead_id):
     """Delete a lead"""
     try:
-        success = lead_manager.delete_lead(lead_id)
+        success = shared_services.lead_manager.delete_lead(lead_id)
         
         if not success:
             return jsonify({
@@ -180,7 +180,7 @@ def delete_lead(lead_id):
 def analyze_lead(lead_id):
     """Analyze a lead using AI"""
     try:
-        lead = lead_manager.get_lead_by_id(lead_id)
+        lead = shared_services.lead_manager.get_lead_by_id(lead_id)
         
         if not lead:
             return jsonify({
@@ -189,10 +189,10 @@ def analyze_lead(lead_id):
             }), 404
         
         # Perform AI analysis
-        analysis = ai_analyzer.analyze_lead(lead)
+        analysis = shared_services.ai_analyzer.analyze_lead(lead)
         
         # Update lead with analysis
-        lead_manager.update_lead(lead_id, {
+        shared_services.lead_manager.update_lead(lead_id, {
             'ai_analysis': analysis,
             'score': analysis.get('score', lead.score)
         })
@@ -228,14 +228,24 @@ def bulk_analyze_leads():
                 'error': 'No lead IDs provided'
             }), 400
         
+        # Analyze all found leads in parallel, then report in request order
+        leads = shared_services.lead_manager.get_leads_by_ids(list(dict.fromkeys(lead_ids)))
+        batch = {result['lead_id']: result for result in shared_services.ai_analyzer.batch_analyze(leads)}
+        scores = {lead.id: lead.score for lead in leads}
+        
         results = []
         for lead_id in lead_ids:
-            lead = lead_manager.get_lead_by_id(lead_id)
-            if lead:
-                analysis = ai_analyzer.analyze_lead(lead)
-                lead_manager.update_lead(lead_id, {
+            result = batch.get(lead_id)
+            if result is None:
+                results.append({
+                    'lead_id': lead_id,
+                    'status': 'not_found'
+                })
+            elif result['success']:
+                analysis = result['analysis']
+                shared_services.lead_manager.update_lead(lead_id, {
                     'ai_analysis': analysis,
-                    'score': analysis.get('score', lead.score)
+                    'score': analysis.get('score', scores[lead_id])
                 })
                 results.append({
                     'lead_id': lead_id,
@@ -245,7 +255,8 @@ def bulk_analyze_leads():
             else:
                 results.append({
                     'lead_id': lead_id,
-                    'status': 'not_found'
+                    'status': 'error',
+                    'error': result['error']
                 })
         
         logger.info(f"Bulk AI analysis completed for {len(lead_ids)} leads")
@@ -279,7 +290,7 @@ def bulk_delete_leads():
                 'error': 'No lead IDs provided'
             }), 400
         
-        deleted_count = lead_manager.bulk_delete(lead_ids)
+        deleted_count = shared_services.lead_manager.bulk_delete(lead_ids)
         
         logger.info(f"Bulk deleted {deleted_count} leads")
         
@@ -304,7 +315,7 @@ def bulk_delete_leads():
 def get_lead_stats():
     """Get lead statistics"""
     try:
-        stats = lead_manager.get_stats()
+        stats = shared_services.lead_manager.get_stats()
         
         return jsonify({
             'success': True,
@@ -4,9 +4,12 @@ Uses OpenAI/Azure OpenAI for intelligent lead analysis and scoring
 """
 
 import os
-from typing import Dict, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional, List, Iterator, Union, FrozenSet
 from loguru import logger
 import json
+import re
 
 try:
     from openai import OpenAI, AzureOpenAI
@@ -18,6 +21,36 @@ except ImportError:
 from app.config import Config
 from app.models.lead import Lead
 
+# Keyword tables used by the fallback scoring, built once at import
+HIGH_VALUE_INDUSTRIES = ('hospitality', 'hotel', 'spa', 'wellness', 'luxury', 'retail', 'boutique')
+MAJOR_CITIES = ('sydney', 'melbourne', 'brisbane', 'perth')
+# (lead attribute, score weight, factor text) for each contact field present
+CONTACT_FIELD_WEIGHTS = (
+    ('email', 10, "Has email contact (+10)"),
+    ('phone', 10, "Has phone contact (+10)"),
+    ('website', 5, "Has website (+5)"),
+    ('contact_name', 5, "Has contact name (+5)"),
+)
+# Single alternations find any of the keywords in one scan
+HIGH_VALUE_INDUSTRY_PATTERN = re.compile('|'.join(HIGH_VALUE_INDUSTRIES), re.IGNORECASE)
+MAJOR_CITY_PATTERN = re.compile('|'.join(MAJOR_CITIES), re.IGNORECASE)
+
+# Industry keywords -> category used to pick recommended products/talking points.
+# The lookahead lets overlapping keywords all be found in a single scan.
+INDUSTRY_CATEGORIES = {
+    'hotel': 'hospitality', 'hospitality': 'hospitality',
+    'spa': 'wellness', 'wellness': 'wellness',
+    'retail': 'retail', 'boutique': 'boutique',
+    'office': 'office', 'corporate': 'office',
+}
+INDUSTRY_CATEGORY_PATTERN = re.compile('(?=(' + '|'.join(INDUSTRY_CATEGORIES) + '))')
+
+# System prompt for lead analysis requests
+ANALYST_SYSTEM_PROMPT = "You are a B2B sales lead analyst specializing in fragrance industry opportunities."
+
+# Pulls the score out of AI responses that are not valid JSON
+SCORE_PATTERN = re.compile(r'"score"\s*:\s*(\d+)')
+
 
 class AILeadAnalyzer:
     """Service for AI-powered lead analysis"""
@@ -26,6 +59,7 @@ class AILeadAnalyzer:
         """Initialize AI analyzer"""
         self.config = Config()
         self.client = None
+        self.concurrency = max(1, self.config.AI_ANALYSIS_CONCURRENCY)
         self._init_client()
     
     def _init_client(self):
@@ -118,7 +152,7 @@ Focus on:
                 response = self.client.chat.completions.create(
                     model=self.config.AZURE_OPENAI_DEPLOYMENT_NAME,
                     messages=[
-                        {"role": "system", "content": "You are a B2B sales lead analyst specializing in fragrance industry opportunities."},
+                        {"role": "system", "content": ANALYST_SYSTEM_PROMPT},
                         {"role": "user", "content": prompt}
                     ],
                     temperature=0.3,
@@ -128,7 +162,7 @@ Focus on:
                 response = self.client.chat.completions.create(
                     model=self.config.OPENAI_MODEL,
                     messages=[
-                        {"role": "system", "content": "You are a B2B sales lead analyst specializing in fragrance industry opportunities."},
+                        {"role": "system", "content": ANALYST_SYSTEM_PROMPT},
                         {"role": "user", "content": prompt}
                     ],
                     temperature=0.3,
@@ -140,11 +174,12 @@ Focus on:
             
             # Extract JSON from response
             try:
-                # Try to find JSON in the response
-                import re
-                json_match = re.search(r'\{[\s\S]*\}', content)
-                if json_match:
-                    analysis = json.loads(json_match.group())
+                # Try to find JSON in the response (outermost braces, ignoring
+                # any prose or code fences around it)
+                start = content.find('{')
+                end = content.rfind('}')
+                if start != -1 and end > start:
+                    analysis = json.loads(content[start:end + 1])
                 else:
                     analysis = json.loads(content)
             except json.JSONDecodeError:
@@ -160,7 +195,6 @@ Focus on:
     
     def _extract_partial_analysis(self, content: str) -> Dict:
         """Extract analysis from non-JSON response"""
-        import re
         
         analysis = {
             'score': 50,
@@ -176,10 +210,11 @@ Focus on:
             'confidence_level': 30
         }
         
-        # Try to extract score
-        score_match = re.search(r'"score"\s*:\s*(\d+)', content)
-        if score_match:
-            analysis['score'] = int(score_match.group(1))
+        # Try to extract score (cheap substring check before running the regex)
+        if content and '"score"' in content:
+            score_match = SCORE_PATTERN.search(content)
+            if score_match:
+                analysis['score'] = int(score_match.group(1))
         
         return analysis
     
@@ -190,41 +225,20 @@ Focus on:
         factors = []
         
         # Score based on available data
-        if lead.email:
-            score += 10
-            factors.append("Has email contact (+10)")
-        
-        if lead.phone:
-            score += 10
-            factors.append("Has phone contact (+10)")
-        
-        if lead.website:
-            score += 5
-            factors.append("Has website (+5)")
-        
-        if lead.contact_name:
-            score += 5
-            factors.append("Has contact name (+5)")
+        for attr, weight, factor in CONTACT_FIELD_WEIGHTS:
+            if getattr(lead, attr):
+                score += weight
+                factors.append(factor)
         
         # Industry relevance
-        high_value_industries = ['hospitality', 'hotel', 'spa', 'wellness', 'luxury', 'retail', 'boutique']
-        if lead.industry:
-            industry_lower = lead.industry.lower()
-            for hvi in high_value_industries:
-                if hvi in industry_lower:
-                    score += 15
-                    factors.append(f"High-value industry: {lead.industry} (+15)")
-                    break
+        if lead.industry and HIGH_VALUE_INDUSTRY_PATTERN.search(lead.industry):
+            score += 15
+            factors.append(f"High-value industry: {lead.industry} (+15)")
         
         # Location bonus (major Australian cities)
-        major_cities = ['sydney', 'melbourne', 'brisbane', 'perth']
-        if lead.location:
-            location_lower = lead.location.lower()
-            for city in major_cities:
-                if city in location_lower:
-                    score += 5
-                    factors.append(f"Major city location (+5)")
-                    break
+        if lead.location and MAJOR_CITY_PATTERN.search(lead.location):
+            score += 5
+            factors.append(f"Major city location (+5)")
         
         # Cap score
         score = min(100, max(0, score))
@@ -243,6 +257,8 @@ Focus on:
             priority = 'low'
             fit = 'poor'
         
+        categories = self._industry_categories(lead.industry)
+        
         return {
             'score': score,
             'priority': priority,
@@ -250,44 +266,49 @@ Focus on:
             'reasoning': f"Automated scoring based on available data. Factors: {', '.join(factors) if factors else 'Basic profile only'}",
             'industry_relevance': score,
             'potential_value': priority,
-            'recommended_products': self._get_recommended_products(lead),
-            'talking_points': self._get_talking_points(lead),
+            'recommended_products': self._get_recommended_products(categories),
+            'talking_points': self._get_talking_points(categories),
             'next_steps': ['Verify contact information', 'Research company online', 'Prepare initial outreach'],
             'risk_factors': ['Analysis based on limited data'],
             'confidence_level': 50,
             'analysis_type': 'fallback'
         }
     
-    def _get_recommended_products(self, lead: Lead) -> List[str]:
-        """Get recommended products based on industry"""
-        
-        industry = (lead.industry or '').lower()
+    @staticmethod
+    @lru_cache(maxsize=1024)  # Industries repeat heavily across Apollo results
+    def _industry_categories(industry: Optional[str]) -> FrozenSet[str]:
+        """Categories (see INDUSTRY_CATEGORIES) whose keywords appear in the industry"""
+        if not industry:
+            return frozenset()
+        return frozenset(INDUSTRY_CATEGORIES[keyword] for keyword in INDUSTRY_CATEGORY_PATTERN.findall(industry.lower()))
+    
+    def _get_recommended_products(self, categories: FrozenSet[str]) -> List[str]:
+        """Get recommended products based on industry categories"""
         
-        if any(x in industry for x in ['hotel', 'hospitality']):
+        if 'hospitality' in categories:
             return ['Room Diffusers', 'Lobby Scent Systems', 'Amenity Lines']
-        elif any(x in industry for x in ['spa', 'wellness']):
+        elif 'wellness' in categories:
             return ['Aromatherapy Oils', 'Treatment Room Diffusers', 'Relaxation Blends']
-        elif any(x in industry for x in ['retail', 'boutique']):
+        elif 'retail' in categories or 'boutique' in categories:
             return ['Store Ambient Scenting', 'Brand Signature Scents', 'Display Diffusers']
-        elif any(x in industry for x in ['office', 'corporate']):
+        elif 'office' in categories:
             return ['Office Scenting Systems', 'Meeting Room Fresheners', 'Productivity Blends']
         else:
             return ['Custom Scent Solutions', 'Ambient Diffusers', 'Air Care Systems']
     
-    def _get_talking_points(self, lead: Lead) -> List[str]:
+    def _get_talking_points(self, categories: FrozenSet[str]) -> List[str]:
         """Generate talking points for sales outreach"""
         
-        industry = (lead.industry or '').lower()
         points = [
             "Scent marketing can increase customer dwell time by up to 40%",
             "Custom fragrance solutions tailored to your brand identity"
         ]
         
-        if any(x in industry for x in ['hotel', 'hospitality']):
+        if 'hospitality' in categories:
             points.append("Hotels using signature scents report 20% higher guest satisfaction")
-        elif any(x in industry for x in ['retail']):
+        elif 'retail' in categories:
             points.append("Retail scenting can boost sales by up to 11%")
-        elif any(x in industry for x in ['spa', 'wellness']):
+        elif 'wellness' in categories:
             points.append("Our therapeutic blends enhance relaxation and treatment outcomes")
         
         return points
@@ -311,6 +332,27 @@ Focus on:
         # Perform analysis
         return self.analyze_lead(lead)
     
+    def iter_analyze_lead_data(self, leads_data: List[Dict]) -> Iterator[Union[Dict, Exception]]:
+        """
+        Analyze several leads in parallel, yielding results in input order
+        
+        Up to ``concurrency`` analyses (each mostly waiting on the OpenAI API)
+        run at once. A lead whose analysis raises yields the exception instead,
+        so one bad lead does not stop the rest.
+        """
+        return self._iter_concurrently(self.analyze_lead_data, leads_data)
+    
+    def _iter_concurrently(self, analyze, items: List) -> Iterator[Union[Dict, Exception]]:
+        """Run ``analyze`` over items on a thread pool, yielding results (or exceptions) in order"""
+        def run(item) -> Union[Dict, Exception]:
+            try:
+                return analyze(item)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            yield from executor.map(run, items)
+    
     def quick_analyze(self, lead_data: Dict) -> Dict:
         """Quick analysis for preview purposes"""
         
@@ -324,22 +366,21 @@ Focus on:
         return analysis
     
     def batch_analyze(self, leads: List[Lead]) -> List[Dict]:
-        """Analyze multiple leads"""
+        """Analyze multiple leads in parallel (see iter_analyze_lead_data)"""
         
         results = []
-        for lead in leads:
-            try:
-                analysis = self.analyze_lead(lead)
+        for lead, analysis in zip(leads, self._iter_concurrently(self.analyze_lead, leads)):
+            if isinstance(analysis, Exception):
                 results.append({
                     'lead_id': lead.id,
-                    'analysis': analysis,
-                    'success': True
+                    'error': str(analysis),
+                    'success': False
                 })
-            except Exception as e:
+            else:
                 results.append({
                     'lead_id': lead.id,
-                    'error': str(e),
-                    'success': False
+                    'analysis': analysis,
+                    'success': True
                 })
         
         return results
@@ -4,10 +4,14 @@ Lead generation using Apollo.io People and Organizations API
 """
 
 import httpx
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from loguru import logger
 from datetime import datetime
+from contextlib import asynccontextmanager
 import asyncio
+import json
+import threading
+import time
 from urllib.parse import urlencode, quote
 from app.config import Config
 
@@ -17,24 +21,115 @@ class ApolloService:
     
     BASE_URL = "https://api.apollo.io/api/v1"
     
+    # Upper bound on cached search responses kept in memory
+    MAX_CACHE_ENTRIES = 256
+    
     def __init__(self):
         self.config = Config()
         self.api_key = self.config.APOLLO_API_KEY
         self.timeout = httpx.Timeout(30.0)
-        
-    def _get_headers(self) -> Dict[str, str]:
-        """Get headers for Apollo API requests"""
-        return {
+        self.enrich_concurrency = max(1, self.config.APOLLO_ENRICH_CONCURRENCY)
+        # Keep enough idle connections alive for a full round of concurrent enrichments
+        self.limits = httpx.Limits(max_keepalive_connections=self.enrich_concurrency)
+        self.cache_ttl = self.config.APOLLO_CACHE_TTL
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._cache_lock = threading.Lock()
+        # Built once; the same headers go on every request
+        self._headers = {
             "Content-Type": "application/json",
             "Cache-Control": "no-cache",
             "accept": "application/json",
             "x-api-key": self.api_key
         }
+        
+    def _get_headers(self) -> Dict[str, str]:
+        """Get headers for Apollo API requests"""
+        return self._headers
     
     def _is_configured(self) -> bool:
         """Check if Apollo API is configured"""
         return bool(self.api_key)
     
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached search result if it is still fresh"""
+        if self.cache_ttl <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry and time.monotonic() - entry[0] < self.cache_ttl:
+            return dict(entry[1])
+        return None
+    
+    def _cache_set(self, key: str, result: Dict[str, Any]) -> None:
+        """Cache a successful search result, evicting expired/oldest entries"""
+        if self.cache_ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._cache_lock:
+            if len(self._cache) >= self.MAX_CACHE_ENTRIES:
+                for stale_key in [k for k, (ts, _) in self._cache.items() if now - ts >= self.cache_ttl]:
+                    del self._cache[stale_key]
+                while len(self._cache) >= self.MAX_CACHE_ENTRIES:
+                    del self._cache[next(iter(self._cache))]
+            self._cache[key] = (now, result)
+    
+    def http_client(self) -> httpx.AsyncClient:
+        """
+        Create a pooled HTTP client for Apollo requests
+        
+        Pass it as ``client`` to several calls made within one event loop
+        (e.g. a search followed by enrich_people) so they reuse connections
+        instead of each opening its own.
+        """
+        return httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+    
+    @asynccontextmanager
+    async def _client_scope(self, client: Optional[httpx.AsyncClient] = None):
+        """Yield the shared client if given, otherwise a short-lived one"""
+        if client is not None:
+            yield client
+        else:
+            async with self.http_client() as new_client:
+                yield new_client
+    
+    @staticmethod
+    def has_unlocked_email(person: Dict) -> bool:
+        """Check if a search result already carries a usable (unlocked) email"""
+        email = person.get("email")
+        # Apollo returns a placeholder address for emails that still need revealing
+        return bool(email) and "email_not_unlocked" not in email
+    
+    @staticmethod
+    def person_source_url(person: Dict) -> Optional[str]:
+        """Apollo app URL for a person, used as the lead's source_url"""
+        return f"https://app.apollo.io/#/people/{person.get('id')}" if person.get('id') else None
+    
+    @staticmethod
+    def _array_params(name: str, values: List[str]) -> List[str]:
+        """Encode a list filter as Apollo's repeated ``name[]=value`` query parameters"""
+        prefix = f"{name}[]="
+        return [prefix + quote(str(value), safe='') for value in values]
+    
+    @staticmethod
+    def _first_email(entries: Any) -> Optional[str]:
+        """Return the first address from an Apollo email list (strings or email objects)"""
+        if not isinstance(entries, list):
+            return None
+        for entry in entries:
+            if isinstance(entry, dict):
+                email_value = entry.get("email") or entry.get("address") or entry.get("raw_email")
+                if email_value:
+                    return email_value
+            elif isinstance(entry, str):
+                return entry
+        return None
+    
+    @staticmethod
+    def _error_text(response: httpx.Response, limit: int = 500) -> str:
+        """Decode only the leading bytes of an error body for logging"""
+        # Avoids decoding (and charset-sniffing) the full body just to truncate it
+        return response.content[:limit].decode("utf-8", errors="replace")
+    
     async def search_people(
         self,
         person_titles: Optional[List[str]] = None,
@@ -45,7 +140,8 @@ class ApolloService:
         q_keywords: Optional[str] = None,
         contact_email_statuses: Optional[List[str]] = None,
         per_page: int = 25,
-        page: int = 1
+        page: int = 1,
+        client: Optional[httpx.AsyncClient] = None,
     ) -> Dict[str, Any]:
         """
         Search for people using Apollo.io People API
@@ -59,6 +155,7 @@ class ApolloService:
             q_keywords: General keyword search
             per_page: Results per page (1-100)
             page: Page number
+            client: Optional shared HTTP client (see http_client)
             
         Returns:
             Dict with people data and pagination info
@@ -85,35 +182,34 @@ class ApolloService:
         
         # Add optional filters as array parameters with [] notation
         if person_titles:
-            for title in person_titles:
-                query_parts.append(f"person_titles[]={quote(str(title), safe='')}")
+            query_parts.extend(self._array_params("person_titles", person_titles))
         if person_locations:
-            for location in person_locations:
-                query_parts.append(f"person_locations[]={quote(str(location), safe='')}")
+            query_parts.extend(self._array_params("person_locations", person_locations))
         if organization_locations:
-            for loc in organization_locations:
-                query_parts.append(f"organization_locations[]={quote(str(loc), safe='')}")
+            query_parts.extend(self._array_params("organization_locations", organization_locations))
         if organization_industries:
-            for industry in organization_industries:
-                query_parts.append(f"organization_industry_tag_ids[]={quote(str(industry), safe='')}")
+            query_parts.extend(self._array_params("organization_industry_tag_ids", organization_industries))
         if organization_num_employees_ranges:
-            for emp_range in organization_num_employees_ranges:
-                query_parts.append(f"organization_num_employees_ranges[]={quote(str(emp_range), safe='')}")
+            query_parts.extend(self._array_params("organization_num_employees_ranges", organization_num_employees_ranges))
         if q_keywords:
             query_parts.append(f"q_keywords={quote(str(q_keywords), safe='')}")
         if contact_email_statuses:
-            for status in contact_email_statuses:
-                query_parts.append(f"contact_email_status[]={quote(str(status), safe='')}")
+            query_parts.extend(self._array_params("contact_email_status", contact_email_statuses))
         
         # Build full URL with query string
         full_url = f"{endpoint}?{'&'.join(query_parts)}" if query_parts else endpoint
         
         logger.debug(f"Apollo API request URL: {full_url}")
+        
+        cached = self._cache_get(full_url)
+        if cached is not None:
+            logger.info(f"Apollo People Search: Using cached results ({len(cached['people'])} results)")
+            return cached
             
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with self._client_scope(client) as http:
                 # POST with query params in URL, empty JSON body
-                response = await client.post(
+                response = await http.post(
                     full_url,
                     headers=self._get_headers(),
                     json={}  # Empty JSON body as required by Apollo
@@ -122,17 +218,19 @@ class ApolloService:
                 if response.status_code == 200:
                     data = response.json()
                     logger.info(f"Apollo People Search: Found {len(data.get('people', []))} results")
-                    return {
+                    result = {
                         "success": True,
                         "people": data.get("people", []),
                         "pagination": data.get("pagination", {}),
                         "total": data.get("pagination", {}).get("total_entries", 0)
                     }
+                    self._cache_set(full_url, result)
+                    return result
                 elif response.status_code == 401:
                     logger.error("Apollo API authentication failed")
                     return {"success": False, "error": "Invalid API key. Please check your APOLLO_API_KEY.", "people": []}
                 elif response.status_code == 403:
-                    error_data = response.json() if response.text else {}
+                    error_data = response.json() if response.content else {}
                     error_msg = error_data.get("error", "Access denied")
                     logger.error(f"Apollo API access denied: {error_msg}")
                     return {
@@ -142,10 +240,10 @@ class ApolloService:
                         "error_code": error_data.get("error_code", "ACCESS_DENIED")
                     }
                 elif response.status_code == 422:
-                    logger.error(f"Apollo API validation error: {response.text}")
+                    logger.error(f"Apollo API validation error: {self._error_text(response)}")
                     return {"success": False, "error": "Invalid search parameters", "people": []}
                 else:
-                    error_text = response.text[:500] if response.text else ""
+                    error_text = self._error_text(response)
                     logger.error(f"Apollo API error: {response.status_code} - {error_text}")
                     return {"success": False, "error": f"API error ({response.status_code}): {error_text}", "people": []}
                     
@@ -163,7 +261,8 @@ class ApolloService:
         organization_num_employees_ranges: Optional[List[str]] = None,
         q_organization_keyword: Optional[str] = None,
         per_page: int = 25,
-        page: int = 1
+        page: int = 1,
+        client: Optional[httpx.AsyncClient] = None,
     ) -> Dict[str, Any]:
         """
         Search for organizations/companies using Apollo.io Organizations API
@@ -175,6 +274,7 @@ class ApolloService:
             q_organization_keyword: Organization keyword search
             per_page: Results per page (1-100)
             page: Page number
+            client: Optional shared HTTP client (see http_client)
             
         Returns:
             Dict with organizations data and pagination info
@@ -198,10 +298,16 @@ class ApolloService:
             payload["organization_num_employees_ranges"] = organization_num_employees_ranges
         if q_organization_keyword:
             payload["q_organization_keyword"] = q_organization_keyword
+        
+        cache_key = f"{endpoint}?{json.dumps(payload, sort_keys=True)}"
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Apollo Org Search: Using cached results ({len(cached['organizations'])} results)")
+            return cached
             
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
+            async with self._client_scope(client) as http:
+                response = await http.post(
                     endpoint,
                     headers=self._get_headers(),
                     json=payload
@@ -210,17 +316,19 @@ class ApolloService:
                 if response.status_code == 200:
                     data = response.json()
                     logger.info(f"Apollo Org Search: Found {len(data.get('organizations', []))} results")
-                    return {
+                    result = {
                         "success": True,
                         "organizations": data.get("organizations", []),
                         "pagination": data.get("pagination", {}),
                         "total": data.get("pagination", {}).get("total_entries", 0)
                     }
+                    self._cache_set(cache_key, result)
+                    return result
                 elif response.status_code == 401:
                     logger.error("Apollo API authentication failed")
                     return {"success": False, "error": "Invalid API key. Please check your APOLLO_API_KEY.", "organizations": []}
                 elif response.status_code == 403:
-                    error_data = response.json() if response.text else {}
+                    error_data = response.json() if response.content else {}
                     error_msg = error_data.get("error", "Access denied")
                     logger.error(f"Apollo API access denied: {error_msg}")
                     return {
@@ -230,7 +338,7 @@ class ApolloService:
                         "error_code": error_data.get("error_code", "ACCESS_DENIED")
                     }
                 else:
-                    error_text = response.text[:500] if response.text else ""
+                    error_text = self._error_text(response)
                     logger.error(f"Apollo API error: {response.status_code} - {error_text}")
                     return {"success": False, "error": f"API error ({response.status_code}): {error_text}", "organizations": []}
                     
@@ -249,6 +357,7 @@ class ApolloService:
         domain: str = None,
         reveal_personal_emails: bool = True,
         reveal_phone_number: bool = False,  # Requires webhook_url, so disabled by default
+        client: Optional[httpx.AsyncClient] = None,
     ) -> Dict[str, Any]:
         """
         Enrich a person's data using Apollo.io People Enrichment API
@@ -261,6 +370,7 @@ class ApolloService:
             last_name: Person's last name
             organization_name: Company name
             domain: Company domain
+            client: Optional shared HTTP client (see http_client)
             
         Returns:
             Enriched person data
@@ -300,8 +410,8 @@ class ApolloService:
             return {"success": False, "error": "Insufficient identifiers for enrichment"}
             
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
+            async with self._client_scope(client) as http:
+                response = await http.post(
                     endpoint,
                     headers=self._get_headers(),
                     json=payload
@@ -313,7 +423,7 @@ class ApolloService:
                     logger.debug(f"Apollo enrichment successful. Email found: {bool(person_data.get('email'))}")
                     return {"success": True, "person": person_data}
                 else:
-                    error_text = response.text[:500] if response.text else ""
+                    error_text = self._error_text(response)
                     logger.warning(f"Apollo enrichment failed: {response.status_code} - {error_text}")
                     return {"success": False, "error": f"API error: {response.status_code} - {error_text}"}
                     
@@ -321,6 +431,74 @@ class ApolloService:
             logger.error(f"Apollo enrichment error: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    async def enrich_people(
+        self,
+        people: List[Dict],
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> List[Dict]:
+        """
+        Enrich search results concurrently to reveal emails
+        
+        Requests share one HTTP client and at most ``enrich_concurrency`` are
+        in flight at a time. People that already have an unlocked email are
+        returned as-is, and anyone whose enrichment fails falls back to the
+        original search result.
+        
+        Args:
+            people: Apollo person objects from a people search
+            client: Optional shared HTTP client (see http_client)
+            
+        Returns:
+            Person objects in the same order as ``people``
+        """
+        semaphore = asyncio.Semaphore(self.enrich_concurrency)
+        
+        async def enrich_one(idx: int, person: Dict, client: httpx.AsyncClient) -> Dict:
+            # Skip the enrichment round-trip (and credit) when the search
+            # result already has an unlocked email
+            if self.has_unlocked_email(person):
+                return person
+            
+            first_name = person.get("first_name")
+            last_name = person.get("last_name")
+            org = person.get("organization", {}) or {}
+            organization_name = org.get("name") or person.get("organization_name")
+            
+            try:
+                logger.debug(f"Enriching person {idx+1}/{len(people)}: {first_name} {last_name} at {organization_name}")
+                
+                async with semaphore:
+                    enriched_result = await self.enrich_person(
+                        email=person.get("email"),
+                        linkedin_url=person.get("linkedin_url"),
+                        person_id=person.get("id"),
+                        first_name=first_name,
+                        last_name=last_name,
+                        organization_name=organization_name,
+                        domain=org.get("primary_domain") or org.get("website_url"),
+                        reveal_personal_emails=True,
+                        reveal_phone_number=False,  # Only need emails, phone requires webhook_url
+                        client=client,
+                    )
+                
+                if enriched_result.get("success") and enriched_result.get("person"):
+                    enriched_person = enriched_result["person"]
+                    logger.info(f"Enrichment successful for {first_name} {last_name}: email={bool(enriched_person.get('email'))}")
+                    return enriched_person
+                
+                error_msg = enriched_result.get("error", "Unknown error")
+                logger.warning(f"Enrichment failed for {first_name} {last_name}: {error_msg}. Using original data.")
+            except Exception as enrich_err:
+                logger.error(f"Error enriching person {idx+1} from Apollo: {enrich_err}")
+            
+            # Fallback to original person data if enrichment fails
+            return person
+        
+        async with self._client_scope(client) as http:
+            return await asyncio.gather(*(
+                enrich_one(idx, person, http) for idx, person in enumerate(people)
+            ))
+    
     def transform_person_to_lead(self, person: Dict) -> Dict:
         """
         Transform Apollo person data to our Lead format
@@ -333,46 +511,16 @@ class ApolloService:
         """
         organization = person.get("organization", {}) or {}
 
-        # Extract email from multiple possible fields in Apollo response
-        primary_email = None
-        
-        # Try direct email field first
-        primary_email = person.get("email")
-        
-        # Try emails array (common in enriched responses)
-        if not primary_email:
-            emails_list = person.get("emails") or []
-            if isinstance(emails_list, list) and len(emails_list) > 0:
-                # Get first verified email, or first email if none verified
-                for email_entry in emails_list:
-                    if isinstance(email_entry, dict):
-                        email_value = email_entry.get("email") or email_entry.get("address") or email_entry.get("raw_email")
-                        if email_value:
-                            primary_email = email_value
-                            break
-                    elif isinstance(email_entry, str):
-                        primary_email = email_entry
-                        break
-        
-        # Try email_addresses array
-        if not primary_email:
-            email_addresses = person.get("email_addresses") or []
-            if isinstance(email_addresses, list) and len(email_addresses) > 0:
-                for addr in email_addresses:
-                    if isinstance(addr, dict):
-                        email_value = addr.get("email") or addr.get("address") or addr.get("raw_email")
-                        if email_value:
-                            primary_email = email_value
-                            break
-                    elif isinstance(addr, str):
-                        primary_email = addr
-                        break
-        
-        # Try personal_emails (from enrichment with reveal_personal_emails)
-        if not primary_email:
-            personal_emails = person.get("personal_emails") or []
-            if isinstance(personal_emails, list) and len(personal_emails) > 0:
-                primary_email = personal_emails[0] if isinstance(personal_emails[0], str) else personal_emails[0].get("email")
+        # Extract email from multiple possible fields in Apollo response,
+        # trying the direct email field first, then the emails array (common in
+        # enriched responses), email_addresses, and finally personal_emails
+        # (from enrichment with reveal_personal_emails)
+        primary_email = (
+            person.get("email")
+            or self._first_email(person.get("emails"))
+            or self._first_email(person.get("email_addresses"))
+            or self._first_email(person.get("personal_emails"))
+        )
         
         # Extract phone from multiple possible fields
         phone = None
@@ -401,7 +549,7 @@ class ApolloService:
         
         return {
             "company_name": organization.get("name", person.get("organization_name", "Unknown")),
-            "contact_name": person.get("name", f"{person.get('first_name', '')} {person.get('last_name', '')}".strip()),
+            "contact_name": contact_name,
             "email": primary_email,
             "phone": phone,
             "website": organization.get("website_url") or organization.get("primary_domain"),
@@ -414,7 +562,7 @@ class ApolloService:
             "seniority": person.get("seniority"),
             "departments": person.get("departments", []),
             "source": "apollo.io",
-            "source_url": f"https://app.apollo.io/#/people/{person.get('id')}" if person.get('id') else None,
+            "source_url": self.person_source_url(person),
             "apollo_id": person.get("id"),
             "raw_data": person  # Store original data for AI analysis
         }
@@ -447,6 +595,21 @@ class ApolloService:
         }
 
 
+# Service shared by the synchronous wrappers, so their calls reuse one
+# config and search cache instead of building a new ApolloService each time
+_sync_service: Optional[ApolloService] = None
+_sync_service_lock = threading.Lock()
+
+
+def _get_sync_service() -> ApolloService:
+    """Get (creating on first use) the service used by the sync wrappers"""
+    global _sync_service
+    with _sync_service_lock:
+        if _sync_service is None:
+            _sync_service = ApolloService()
+        return _sync_service
+
+
     # Synchronous wrapper for use in Flask routes
 def search_people_sync(
     person_titles: Optional[List[str]] = None,
@@ -459,7 +622,7 @@ def search_people_sync(
     page: int = 1
 ) -> Dict[str, Any]:
     """Synchronous wrapper for search_people"""
-    service = ApolloService()
+    service = _get_sync_service()
     return asyncio.run(service.search_people(
         person_titles=person_titles,
         person_locations=person_locations,
@@ -480,7 +643,7 @@ def search_organizations_sync(
     page: int = 1
 ) -> Dict[str, Any]:
     """Synchronous wrapper for search_organizations"""
-    service = ApolloService()
+    service = _get_sync_service()
     return asyncio.run(service.search_organizations(
         organization_locations=organization_locations,
         organization_industries=organization_industries,
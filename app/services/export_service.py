@@ -4,10 +4,14 @@ Handles exporting leads to Excel and CSV formats
 """
 
 import os
-from typing import List
+from typing import List, TYPE_CHECKING
 from datetime import datetime
 from loguru import logger
-import pandas as pd
+
+# pandas is imported where it is used, so loading the app (and the export
+# routes) does not pay its import cost until an export actually runs
+if TYPE_CHECKING:
+    import pandas as pd
 
 from app.models.lead import Lead
 from app.config import Config
@@ -22,49 +26,55 @@ class ExportService:
         self.export_folder = self.config.EXPORT_FOLDER
         os.makedirs(self.export_folder, exist_ok=True)
     
-    def _leads_to_dataframe(self, leads: List[Lead]) -> pd.DataFrame:
+    def _leads_to_dataframe(self, leads: List[Lead]) -> 'pd.DataFrame':
         """Convert leads to pandas DataFrame"""
+        import pandas as pd
         
-        data = []
-        for lead in leads:
-            # Flatten AI analysis for export
-            ai_analysis = lead.ai_analysis or {}
-            
-            row = {
-                'ID': lead.id,
-                'Company Name': lead.company_name,
-                'Contact Name': lead.contact_name,
-                'Email': lead.email,
-                'Phone': lead.phone,
-                'Website': lead.website,
-                'Industry': lead.industry,
-                'Location': lead.location,
-                'Address': lead.address,
-                'Company Size': lead.company_size,
-                'Status': lead.status.value if hasattr(lead.status, 'value') else lead.status,
-                'Priority': lead.priority.value if hasattr(lead.priority, 'value') else lead.priority,
-                'Source': lead.source.value if hasattr(lead.source, 'value') else lead.source,
-                'Score': lead.score,
-                'Estimated Value': lead.estimated_value,
-                'AI Fit Assessment': ai_analysis.get('fit_assessment', ''),
-                'AI Reasoning': ai_analysis.get('reasoning', ''),
-                'AI Confidence': ai_analysis.get('confidence_level', ''),
-                'Recommended Products': ', '.join(ai_analysis.get('recommended_products', [])),
-                'Talking Points': ' | '.join(ai_analysis.get('talking_points', [])),
-                'Next Steps': ' | '.join(ai_analysis.get('next_steps', [])),
-                'Tags': ', '.join(lead.tags) if lead.tags else '',
-                'Notes': lead.notes,
-                'Created At': lead.created_at.strftime('%Y-%m-%d %H:%M:%S') if lead.created_at else '',
-                'Updated At': lead.updated_at.strftime('%Y-%m-%d %H:%M:%S') if lead.updated_at else '',
-                'Last Contacted': lead.last_contacted.strftime('%Y-%m-%d %H:%M:%S') if lead.last_contacted else '',
-                'Source URL': lead.source_url
-            }
-            data.append(row)
+        # Built column by column: pandas takes each list as a column directly
+        # instead of re-inferring the columns from one dict per row
+        date_format = '%Y-%m-%d %H:%M:%S'
+        # Flatten AI analysis for export
+        analyses = [lead.ai_analysis or {} for lead in leads]
+        
+        def enum_value(value):
+            return value.value if hasattr(value, 'value') else value
         
-        return pd.DataFrame(data)
+        def formatted(value):
+            return value.strftime(date_format) if value else ''
+        
+        return pd.DataFrame({
+            'ID': [lead.id for lead in leads],
+            'Company Name': [lead.company_name for lead in leads],
+            'Contact Name': [lead.contact_name for lead in leads],
+            'Email': [lead.email for lead in leads],
+            'Phone': [lead.phone for lead in leads],
+            'Website': [lead.website for lead in leads],
+            'Industry': [lead.industry for lead in leads],
+            'Location': [lead.location for lead in leads],
+            'Address': [lead.address for lead in leads],
+            'Company Size': [lead.company_size for lead in leads],
+            'Status': [enum_value(lead.status) for lead in leads],
+            'Priority': [enum_value(lead.priority) for lead in leads],
+            'Source': [enum_value(lead.source) for lead in leads],
+            'Score': [lead.score for lead in leads],
+            'Estimated Value': [lead.estimated_value for lead in leads],
+            'AI Fit Assessment': [a.get('fit_assessment', '') for a in analyses],
+            'AI Reasoning': [a.get('reasoning', '') for a in analyses],
+            'AI Confidence': [a.get('confidence_level', '') for a in analyses],
+            'Recommended Products': [', '.join(a.get('recommended_products', [])) for a in analyses],
+            'Talking Points': [' | '.join(a.get('talking_points', [])) for a in analyses],
+            'Next Steps': [' | '.join(a.get('next_steps', [])) for a in analyses],
+            'Tags': [', '.join(lead.tags) if lead.tags else '' for lead in leads],
+            'Notes': [lead.notes for lead in leads],
+            'Created At': [formatted(lead.created_at) for lead in leads],
+            'Updated At': [formatted(lead.updated_at) for lead in leads],
+            'Last Contacted': [formatted(lead.last_contacted) for lead in leads],
+            'Source URL': [lead.source_url for lead in leads]
+        })
     
     def export_to_excel(self, leads: List[Lead], filename: str) -> str:
         """Export leads to Excel file"""
+        import pandas as pd
         
         filepath = os.path.join(self.export_folder, filename)
         
@@ -153,32 +163,32 @@ class ExportService:
             logger.error(f"Error exporting to Excel: {str(e)}")
             raise
     
-    def _add_summary_sheet(self, writer: pd.ExcelWriter, workbook, leads: List[Lead]):
+    def _add_summary_sheet(self, writer: 'pd.ExcelWriter', workbook, leads: List[Lead]):
         """Add a summary sheet to the Excel file"""
+        import pandas as pd
         
-        # Calculate statistics
+        # Calculate statistics in a single pass over the leads
         total_leads = len(leads)
-        avg_score = sum(l.score for l in leads) / total_leads if total_leads > 0 else 0
-        total_value = sum(l.estimated_value for l in leads)
-        
-        # Count by status
+        score_sum = 0
+        total_value = 0
         status_counts = {}
+        priority_counts = {}
+        industry_counts = {}
         for lead in leads:
+            score_sum += lead.score
+            total_value += lead.estimated_value
+            
             status = lead.status.value if hasattr(lead.status, 'value') else lead.status
             status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Count by priority
-        priority_counts = {}
-        for lead in leads:
+            
             priority = lead.priority.value if hasattr(lead.priority, 'value') else lead.priority
             priority_counts[priority] = priority_counts.get(priority, 0) + 1
-        
-        # Count by industry
-        industry_counts = {}
-        for lead in leads:
+            
             industry = lead.industry or 'Unknown'
             industry_counts[industry] = industry_counts.get(industry, 0) + 1
         
+        avg_score = score_sum / total_leads if total_leads > 0 else 0
+        
         # Create summary data
         summary_data = {
             'Metric': [
@@ -3,11 +3,23 @@ Lead Manager Service
 Handles lead storage, retrieval, and management
 """
 
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, Set
+from collections import Counter
 from datetime import datetime
+from fractions import Fraction
 from loguru import logger
+import atexit
+import copy
+import heapq
 import json
 import os
+import threading
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 from app.models.lead import Lead, LeadStatus, LeadPriority
 
@@ -16,48 +28,255 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
 
+def _json_loads(data: bytes):
+    """Parse JSON bytes, using orjson when available"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+
 class LeadManager:
-    """Service for managing leads"""
+    """Service for managing leads
+    
+    The store assumes a single writer: a full save replaces leads.json with this
+    process's leads and removes the journal, so leads written by another process
+    sharing the data directory are lost.
+    """
+    
+    # Seconds the background writer waits to coalesce changes before saving
+    FLUSH_INTERVAL = 2.0
+    # Number of buffered new leads that triggers a journal write before the interval
+    JOURNAL_BATCH_SIZE = 25
     
     def __init__(self):
         """Initialize lead manager with in-memory storage"""
         self._leads: Dict[str, Lead] = {}
+        self._reset_index()
+        self._lock = threading.RLock()  # Guards self._leads and the index/aggregates
+        # Serializes writes to the data/journal files; always taken before self._lock.
+        # Reentrant so reload_leads can hold it across a flush and a reload.
+        self._write_lock = threading.RLock()
+        self._dirty = threading.Event()  # Set when the whole store needs rewriting
+        self._wake = threading.Event()  # Set when there is anything for the writer to do
+        self._batch_ready = threading.Event()  # Set when the journal buffer is full
+        self._journal_buffer: List[bytes] = []  # Guarded by self._lock
         self._data_file = os.path.join(DATA_DIR, 'leads.json')
+        # New leads are appended here and folded into leads.json on the next full save
+        self._journal_file = os.path.join(DATA_DIR, 'leads.journal.jsonl')
         logger.debug(f"Lead data file: {self._data_file}")
         self._load_leads()
+        
+        # Changes are persisted by a background writer so bursts of updates
+        # (e.g. a generation job saving leads one by one) share a single save
+        self._writer = threading.Thread(target=self._writer_loop, name='lead-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
     
     def _load_leads(self):
         """Load leads from file storage"""
         try:
             if os.path.exists(self._data_file):
-                with open(self._data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for lead_data in data:
-                        try:
-                            lead = Lead.from_dict(lead_data)
-                            self._leads[lead.id] = lead
-                        except Exception as e:
-                            logger.warning(f"Error loading lead from data: {str(e)}")
-                            continue
+                with open(self._data_file, 'rb') as f:
+                    data = _json_loads(f.read())
+                for lead_data in data:
+                    try:
+                        self._put(Lead.from_dict(lead_data))
+                    except Exception as e:
+                        logger.warning(f"Error loading lead from data: {str(e)}")
+                        continue
                 logger.info(f"Loaded {len(self._leads)} leads from storage")
             else:
                 logger.info("No leads file found, starting with empty storage")
+            self._replay_journal()
         except Exception as e:
             logger.error(f"Error loading leads: {str(e)}")
             # Initialize with sample data for demo only if file doesn't exist
             if not os.path.exists(self._data_file):
                 self._init_sample_data()
     
+    def _reset_index(self):
+        """Reset the status index and the running totals behind get_stats"""
+        # Lead ids by status value, so status filters/counts skip a full scan
+        self._by_status: Dict[str, Set[str]] = {status.value: set() for status in LeadStatus}
+        self._priority_counts = Counter()
+        self._industry_counts = Counter()
+        self._created_month_counts = Counter()
+        self._score_total = 0
+        # Kept as an exact Fraction: a float total drifts as leads are added
+        # and removed (and would not return to 0 once they are all deleted)
+        self._value_total = Fraction(0)
+    
+    @staticmethod
+    def _index_entry(lead: Lead) -> Tuple:
+        """Work out a lead's index keys and totals contributions"""
+        # Everything that can raise on a malformed lead happens here, before
+        # any counter changes, so _index/_unindex apply all or nothing
+        industry = lead.industry or None
+        if industry is not None:
+            hash(industry)
+        return (lead.status.value, lead.priority.value, industry, lead.created_at.month,
+                lead.score + 0, Fraction(lead.estimated_value or 0))
+    
+    def _index(self, lead: Lead, entry: Optional[Tuple] = None):
+        """Add a lead to the index and running totals (caller holds the lock)"""
+        status, priority, industry, month, score, value = entry or self._index_entry(lead)
+        self._by_status[status].add(lead.id)
+        self._priority_counts[priority] += 1
+        if industry:
+            self._industry_counts[industry] += 1
+        self._created_month_counts[month] += 1
+        self._score_total += score
+        self._value_total += value
+    
+    def _unindex(self, lead: Lead):
+        """Remove a lead from the index and running totals (caller holds the lock)"""
+        status, priority, industry, month, score, value = self._index_entry(lead)
+        self._by_status[status].discard(lead.id)
+        self._priority_counts[priority] -= 1
+        if industry:
+            self._industry_counts[industry] -= 1
+            if not self._industry_counts[industry]:
+                del self._industry_counts[industry]
+        self._created_month_counts[month] -= 1
+        self._score_total -= score
+        self._value_total -= value
+    
+    def _put(self, lead: Lead):
+        """Insert or replace a lead and index it (caller holds the lock)"""
+        # Checked before anything changes, so a lead that cannot be indexed
+        # is never stored and does not displace the lead it would replace
+        entry = self._index_entry(lead)
+        previous = self._leads.get(lead.id)
+        if previous is not None:
+            self._unindex(previous)
+        self._index(lead, entry)
+        self._leads[lead.id] = lead
+    
+    def _update_indexed(self, lead: Lead, data: Dict):
+        """Apply an update to a stored lead and re-index it (caller holds the lock)"""
+        previous = copy.copy(lead)
+        self._unindex(lead)
+        try:
+            lead.update(data)
+            self._index(lead)
+        except Exception:
+            # Roll back so the lead in memory still matches what is on disk;
+            # the old values were indexable, so re-indexing them cannot fail
+            lead.__dict__.update(previous.__dict__)
+            self._index(lead)
+            raise
+    
+    def _pop(self, lead_id: str) -> Optional[Lead]:
+        """Remove a lead and its index entry (caller holds the lock)"""
+        lead = self._leads.pop(lead_id, None)
+        if lead is not None:
+            self._unindex(lead)
+        return lead
+    
+    def _replay_journal(self):
+        """Apply leads appended to the journal since the last full save"""
+        if not os.path.exists(self._journal_file):
+            return
+        
+        replayed = 0
+        with open(self._journal_file, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    self._put(Lead.from_dict(_json_loads(line)))
+                    replayed += 1
+                except Exception as e:
+                    # e.g. a torn final line from a crash mid-append
+                    logger.warning(f"Error loading lead from journal: {str(e)}")
+        
+        if replayed:
+            logger.info(f"Replayed {replayed} leads from journal")
+            # Fold the journal back into leads.json
+            self._mark_dirty()
+    
+    @staticmethod
+    def _journal_line(lead: Lead) -> bytes:
+        """Serialize a lead as a single journal line"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(lead, default=str) + b'\n'
+        return (json.dumps(lead.to_dict(), default=str, ensure_ascii=False) + '\n').encode('utf-8')
+    
+    def _append_to_journal(self, line: bytes):
+        """Buffer a journal line for the background writer (caller holds the lock)"""
+        self._journal_buffer.append(line)
+        if len(self._journal_buffer) >= self.JOURNAL_BATCH_SIZE:
+            self._batch_ready.set()
+        self._wake.set()
+    
+    def _flush_journal(self):
+        """Append buffered new leads to the journal"""
+        with self._write_lock:
+            with self._lock:
+                lines, self._journal_buffer = self._journal_buffer, []
+            if not lines:
+                return
+            try:
+                os.makedirs(DATA_DIR, exist_ok=True)
+                with open(self._journal_file, 'ab') as f:
+                    f.write(b''.join(lines))
+            except Exception as e:
+                logger.error(f"Error appending leads to {self._journal_file}: {str(e)}. Scheduling full save.")
+                self._mark_dirty()
+    
+    def _mark_dirty(self):
+        """Schedule the leads to be saved by the background writer"""
+        self._dirty.set()
+        self._wake.set()
+    
+    def _writer_loop(self):
+        """Background thread that saves pending changes"""
+        while True:
+            self._wake.wait()
+            # Coalesce changes for up to FLUSH_INTERVAL, or until a batch of new leads is buffered
+            self._batch_ready.wait(self.FLUSH_INTERVAL)
+            self.flush()
+    
+    def flush(self):
+        """Save pending changes to file storage immediately"""
+        # Clear before saving so changes made during the save schedule another
+        self._wake.clear()
+        self._batch_ready.clear()
+        if self._dirty.is_set():
+            self._dirty.clear()
+            # A full save also covers the buffered journal lines
+            self._save_leads()
+        else:
+            self._flush_journal()
+    
     def _save_leads(self):
         """Save leads to file storage"""
         try:
             os.makedirs(DATA_DIR, exist_ok=True)
-            with open(self._data_file, 'w', encoding='utf-8') as f:
-                data = [lead.to_dict() for lead in self._leads.values()]
-                json.dump(data, f, indent=2, default=str, ensure_ascii=False)
-            logger.debug(f"Saved {len(self._leads)} leads to {self._data_file}")
+            # The snapshot is taken under the write lock so any lead missing from
+            # it is appended to the journal only after the journal is reset below
+            with self._write_lock:
+                with self._lock:
+                    leads = list(self._leads.values())
+                    self._journal_buffer = []
+                if ORJSON_AVAILABLE:
+                    # orjson serializes the Lead dataclasses (enums, datetimes) directly
+                    payload = orjson.dumps(leads, default=str)
+                else:
+                    data = [lead.to_dict() for lead in leads]
+                    payload = json.dumps(data, separators=(',', ':'), default=str, ensure_ascii=False).encode('utf-8')
+                # Write to a temp file and swap it in, so a crash mid-write
+                # never leaves a truncated leads.json behind
+                tmp_file = self._data_file + '.tmp'
+                with open(tmp_file, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_file, self._data_file)
+                if os.path.exists(self._journal_file):
+                    os.remove(self._journal_file)
+            logger.debug(f"Saved {len(leads)} leads to {self._data_file}")
         except Exception as e:
-            logger.error(f"Error saving leads to {self._data_file}: {str(e)}")
+            # The journal buffer was already folded into the failed snapshot, so
+            # retry the full save rather than lose the leads it held
+            logger.error(f"Error saving leads to {self._data_file}: {str(e)}. Will retry.")
+            self._mark_dirty()
     
     def _init_sample_data(self):
         """Initialize with sample lead data"""
@@ -135,8 +354,7 @@ class LeadManager:
         ]
         
         for lead_data in sample_leads:
-            lead = Lead.from_dict(lead_data)
-            self._leads[lead.id] = lead
+            self._put(Lead.from_dict(lead_data))
         
         self._save_leads()
         logger.info(f"Initialized {len(sample_leads)} sample leads")
@@ -153,39 +371,53 @@ class LeadManager:
     ) -> Tuple[List[Lead], int]:
         """Get leads with optional filtering"""
         
-        leads = list(self._leads.values())
+        with self._lock:
+            if status:
+                # Start from the status index instead of scanning every lead
+                leads = [self._leads[lead_id] for lead_id in self._by_status.get(status, ())]
+            else:
+                leads = list(self._leads.values())
         
-        # Apply filters
-        if status:
-            leads = [l for l in leads if l.status.value == status]
+        # Apply all filters in a single pass, without intermediate lists
+        filters = []
         
         if priority:
-            leads = [l for l in leads if l.priority.value == priority]
+            filters.append(lambda l: l.priority.value == priority)
         
         if industry:
-            leads = [l for l in leads if l.industry and industry.lower() in l.industry.lower()]
+            industry_lower = industry.lower()
+            filters.append(lambda l: l.industry and industry_lower in l.industry.lower())
         
         if location:
-            leads = [l for l in leads if l.location and location.lower() in l.location.lower()]
+            location_lower = location.lower()
+            filters.append(lambda l: l.location and location_lower in l.location.lower())
         
         if search:
             search_lower = search.lower()
-            leads = [l for l in leads if (
-                search_lower in l.company_name.lower() or
-                (l.contact_name and search_lower in l.contact_name.lower()) or
-                (l.email and search_lower in l.email.lower()) or
-                (l.industry and search_lower in l.industry.lower())
-            )]
+            # One lower() and substring test per lead over all searchable fields;
+            # the NUL separator keeps matches from spanning two fields
+            filters.append(lambda l: search_lower in '\0'.join((
+                l.company_name, l.contact_name or '', l.email or '', l.industry or ''
+            )).lower())
         
-        # Sort by score (highest first) then by created_at (newest first)
-        leads.sort(key=lambda x: (-x.score, -x.created_at.timestamp()))
+        if filters:
+            leads = [l for l in leads if all(f(l) for f in filters)]
         
         total = len(leads)
         
-        # Paginate
+        # Sort by score (highest first) then by created_at (newest first)
+        sort_key = lambda x: (-x.score, -x.created_at.timestamp())
+        
+        # Paginate; only the leads up to the end of the requested page need
+        # ordering, so a partial heap select replaces the full sort. Negative
+        # page/per_page values keep the full sort so slicing behaves as before.
         start = (page - 1) * per_page
         end = start + per_page
-        paginated_leads = leads[start:end]
+        if start >= 0 and per_page > 0:
+            ordered = heapq.nsmallest(end, leads, key=sort_key)
+        else:
+            ordered = sorted(leads, key=sort_key)
+        paginated_leads = ordered[start:end]
         
         return paginated_leads, total
     
@@ -193,98 +425,118 @@ class LeadManager:
         """Get a single lead by ID"""
         return self._leads.get(lead_id)
     
+    def get_leads_by_ids(self, lead_ids: List[str]) -> List[Lead]:
+        """Get the leads for the given IDs, skipping unknown ones"""
+        with self._lock:
+            return [lead for lead in map(self._leads.get, lead_ids) if lead]
+    
     def create_lead(self, data: Dict) -> Lead:
         """Create a new lead"""
         lead = Lead.from_dict(data)
-        self._leads[lead.id] = lead
-        self._save_leads()
+        line = self._journal_line(lead)
+        with self._lock:
+            self._put(lead)
+            # Appending is O(1) per lead, unlike rewriting the whole store
+            self._append_to_journal(line)
         logger.info(f"Created lead: {lead.company_name} ({lead.id})")
         return lead
     
     def update_lead(self, lead_id: str, data: Dict) -> Optional[Lead]:
         """Update an existing lead"""
-        lead = self._leads.get(lead_id)
-        if not lead:
-            return None
-        
-        lead.update(data)
-        self._save_leads()
+        with self._lock:
+            lead = self._leads.get(lead_id)
+            if not lead:
+                return None
+            self._update_indexed(lead, data)
+        self._mark_dirty()
         logger.info(f"Updated lead: {lead_id}")
         return lead
     
     def delete_lead(self, lead_id: str) -> bool:
         """Delete a lead"""
-        if lead_id in self._leads:
-            del self._leads[lead_id]
-            self._save_leads()
-            logger.info(f"Deleted lead: {lead_id}")
-            return True
-        return False
+        with self._lock:
+            if self._pop(lead_id) is None:
+                return False
+        self._mark_dirty()
+        logger.info(f"Deleted lead: {lead_id}")
+        return True
     
     def get_stats(self) -> Dict:
         """Get lead statistics"""
-        leads = list(self._leads.values())
-        
-        # Count by status
-        status_counts = {}
-        for status in LeadStatus:
-            status_counts[status.value] = len([l for l in leads if l.status == status])
-        
-        # Count by priority
-        priority_counts = {}
-        for priority in LeadPriority:
-            priority_counts[priority.value] = len([l for l in leads if l.priority == priority])
-        
-        # Calculate averages
-        total_value = sum(l.estimated_value for l in leads)
-        avg_score = sum(l.score for l in leads) / len(leads) if leads else 0
-        
-        # Top industries
-        industry_counts = {}
-        for lead in leads:
-            if lead.industry:
-                industry_counts[lead.industry] = industry_counts.get(lead.industry, 0) + 1
-        
-        top_industries = sorted(industry_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        # Everything is read off totals maintained by _index/_unindex
+        with self._lock:
+            total_leads = len(self._leads)
+            status_counts = {value: len(lead_ids) for value, lead_ids in self._by_status.items()}
+            priority_counts = {priority.value: self._priority_counts[priority.value] for priority in LeadPriority}
+            total_value = float(self._value_total)
+            avg_score = self._score_total / total_leads if total_leads else 0
+            top_industries = self._industry_counts.most_common(5)
+            new_this_month = self._created_month_counts[datetime.utcnow().month]
         
         return {
-            'total_leads': len(leads),
+            'total_leads': total_leads,
             'by_status': status_counts,
             'by_priority': priority_counts,
             'total_estimated_value': total_value,
             'average_score': round(avg_score, 1),
             'top_industries': dict(top_industries),
-            'new_this_month': len([l for l in leads if l.created_at.month == datetime.utcnow().month]),
+            'new_this_month': new_this_month,
             'high_priority_count': priority_counts.get('high', 0)
         }
     
     def bulk_update_status(self, lead_ids: List[str], new_status: str) -> int:
         """Update status for multiple leads"""
         updated_count = 0
-        for lead_id in lead_ids:
-            if self.update_lead(lead_id, {'status': new_status}):
-                updated_count += 1
+        # One lock acquisition and one scheduled save for the whole batch
+        try:
+            with self._lock:
+                for lead_id in lead_ids:
+                    lead = self._leads.get(lead_id)
+                    if not lead:
+                        continue
+                    self._update_indexed(lead, {'status': new_status})
+                    updated_count += 1
+        finally:
+            # Leads updated before a failure are saved too
+            if updated_count > 0:
+                self._mark_dirty()
+        
+        if updated_count > 0:
+            logger.info(f"Bulk updated status of {updated_count} leads to {new_status}")
+        
         return updated_count
     
+    def get_source_urls(self) -> Set[str]:
+        """Get the source URLs of all stored leads (for de-duplicating imports)"""
+        # Called from generation-job threads while other threads create leads
+        with self._lock:
+            return {lead.source_url for lead in self._leads.values() if lead.source_url}
+    
     def get_all_leads(self) -> List[Lead]:
         """Get all leads without pagination"""
         return list(self._leads.values())
     
     def reload_leads(self):
         """Reload leads from file storage (useful after external changes)"""
-        self._leads.clear()
-        self._load_leads()
+        # Locks are taken in the writer's order (write lock, then lead lock)
+        with self._write_lock:
+            with self._lock:
+                # Persist pending creates/updates/deletes so the reload does not revert them
+                self.flush()
+                self._leads.clear()
+                self._reset_index()
+                self._load_leads()
     
     def bulk_delete(self, lead_ids: List[str]) -> int:
         """Delete multiple leads at once"""
         deleted_count = 0
-        for lead_id in lead_ids:
-            if lead_id in self._leads:
-                del self._leads[lead_id]
-                deleted_count += 1
+        with self._lock:
+            for lead_id in lead_ids:
+                if self._pop(lead_id) is not None:
+                    deleted_count += 1
         
         if deleted_count > 0:
-            self._save_leads()
+            self._mark_dirty()
             logger.info(f"Bulk deleted {deleted_count} leads")
         
         return deleted_count
@@ -3,9 +3,32 @@ Shared Service Instances
 Singleton instances shared across all blueprints
 """
 
-from app.services.lead_manager import LeadManager
-from app.services.ai_analyzer import AILeadAnalyzer
+import threading
 
-# Shared instances - these are singletons used across all blueprints
-lead_manager = LeadManager()
-ai_analyzer = AILeadAnalyzer()
+# Shared instances - these are singletons used across all blueprints. They are
+# created on first access (PEP 562 module __getattr__), so importing this module
+# does not load the lead store or set up the OpenAI client.
+_instances_lock = threading.Lock()
+
+
+def _create(name):
+    """Construct the named shared service"""
+    if name == 'lead_manager':
+        from app.services.lead_manager import LeadManager
+        return LeadManager()
+    from app.services.ai_analyzer import AILeadAnalyzer
+    return AILeadAnalyzer()
+
+
+def __getattr__(name):
+    """Create the shared services on first access"""
+    if name not in ('lead_manager', 'ai_analyzer'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with _instances_lock:
+        # Another thread may have created it while we waited for the lock
+        instance = globals().get(name)
+        if instance is None:
+            # Stored as a module global, so later lookups bypass __getattr__
+            instance = globals()[name] = _create(name)
+    return instance